@@ -1,5 +1,3 @@
-import struct
-
 import device
 import probe
 from register import *
@@ -48,6 +46,8 @@ alarm_codes = { # 0x1043
     51: "Stop failure w/ oil pressure switch",
 }
 
+_ALARM_CODES = frozenset(alarm_codes)
+
 warning_code_1 = { # 0x1047
     12: "Low fuel level sensor",
     13: "Low fuel level switch",
@@ -72,9 +72,37 @@ warning_code_3 = { # 0x1045
 warning_code_4 = { # 0x1044
 }
 
+# Mebay running status (0x1041) to genset /StatusCode
+_STATUS_MAP = {
+    0: 9,  # Stop idle speed = Stopping
+    1: 9,  # Under stop = Stopping
+    2: 0,  # Waiting = Stopped
+    3: 9,  # Crank cancel = Stopping
+    4: 0,  # Crank ready =
+    5: 0,  # Alarm reset =
+    6: 0,  # Standby = Stopped
+    7: 2,  # Pre-heat = Starting
+    8: 2,  # Pre-oil supply = Starting
+    9: 2,  # Crank delay = Starting
+    10: 3,  # Crank ready = Starting
+    11: 3,  # In crank = Starting
+    12: 3,  # Safety delay = Starting
+    13: 3,  # Idle speed = Starting
+    14: 3,  # Speed-up = Starting
+    15: 3,  # Tempurature-up = Starting
+    16: 3,  # Volt-buildup = Starting
+    17: 3,  # High-speed waming = Starting
+    18: 8,  # Rated running = Running
+    19: 8,  # Mains revert (transfer back to mains) = Stopping
+    20: 9,  # Cooling running (cool down) = Stopping
+    21: 9,  # Gen return (stop idle time) = Stopping
+    22: 9,  # Under stop by radiator = Stopping
+    23: 9,  # Switching = Stopping
+}
+
 class Reg_Mebay_alarms(Reg):
-    def __init__(self):
-        super().__init__(0x1043, 5)
+    def __init__(self, **kwargs):
+        super().__init__(0x1043, 5, **kwargs)
 
     def decode(self, values):
         """ Unpack values to unsigned int (16bit)
@@ -83,11 +111,7 @@ class Reg_Mebay_alarms(Reg):
             0x1045 = warning code 3
             0x1046 = warning code 2
             0x1047 = warning code 1 """
-        self.update([struct.unpack("H", struct.pack("H", v)) for v in values])
-
-def unpack_bits(val):
-    for i in range(15, 0, -1):
-        yield (val >> i) & 1
+        return self.update([v & 0xFFFF for v in values])
 
 class Mebay_Generator(device.CustomName, device.ErrorId, device.Genset):
     vendor_id = "mebay"
@@ -105,39 +129,33 @@ class Mebay_Generator(device.CustomName, device.ErrorId, device.Genset):
     SCF_TELEMETRY_START = 0x5555  # Telemetry start if in auto mode
     SCF_TELEMETRY_STOP = 0x1111  # Cancel telemetry start in auto mode
 
+    # (alarm register index, error id offset) of warning code 1..4
+    _WARN_SLOTS = ((4, 0x00), (3, 0x10), (2, 0x20), (1, 0x30))
+
+    # (base, name, scale, text) of the plain u16 data registers
+    _DATA_REG_SPEC = (
+        (0x1001, "/StarterVoltage", 10, "%.1f V"),
+        (0x1009, "/Ac/Frequency", 10, "%.1f Hz"),
+        (0x100A, "/Ac/L1/Voltage", 1, "%.0f V"),
+        (0x100B, "/Ac/L2/Voltage", 1, "%.0f V"),
+        (0x100C, "/Ac/L3/Voltage", 1, "%.0f V"),
+        (0x1010, "/Ac/L1/Current", 1, "%.0f A"),
+        (0x1011, "/Ac/L2/Current", 1, "%.0f A"),
+        (0x1012, "/Ac/L3/Current", 1, "%.0f A"),
+        (0x1018, "/Ac/L1/Power", 1, "%.0f W"),
+        (0x1019, "/Ac/L2/Power", 1, "%.0f W"),
+        (0x101A, "/Ac/L3/Power", 1, "%.0f W"),
+        (0x101B, "/Ac/Power", 1, "%.0f W"),
+        (0x1035, "/Engine/Starts", 1, "%.0f"),
+        (0x1039, "/Engine/Load", 1, "%.0f %%"),
+        (0x1053, "/Engine/OilPressure", 1, "%.0f kPa"),
+        (0x1054, "/Engine/CoolantTemperature", 1, "%.1f C"),
+    )
+
     def __init__(self, *args):
         super().__init__(*args)
 
-        self.running_status_reg = Reg_mapu16(
-            0x1041,
-            "/StatusCode",
-            {
-                0: 9,  # Stop idle speed = Stopping
-                1: 9,  # Under stop = Stopping
-                2: 0,  # Waiting = Stopped
-                3: 9,  # Crank cancel = Stopping
-                4: 0,  # Crank ready =
-                5: 0,  # Alarm reset =
-                6: 0,  # Standby = Stopped
-                7: 2,  # Pre-heat = Starting
-                8: 2,  # Pre-oil supply = Starting
-                9: 2,  # Crank delay = Starting
-                10: 3,  # Crank ready = Starting
-                11: 3,  # In crank = Starting
-                12: 3,  # Safety delay = Starting
-                13: 3,  # Idle speed = Starting
-                14: 3,  # Speed-up = Starting
-                15: 3,  # Tempurature-up = Starting
-                16: 3,  # Volt-buildup = Starting
-                17: 3,  # High-speed waming = Starting
-                18: 8,  # Rated running = Running
-                19: 8,  # Mains revert (transfer back to mains) = Stopping
-                20: 9,  # Cooling running (cool down) = Stopping
-                21: 9,  # Gen return (stop idle time) = Stopping
-                22: 9,  # Under stop by radiator = Stopping
-                23: 9,  # Switching = Stopping
-            },
-        )
+        self.running_status_reg = Reg_mapu16(0x1041, "/StatusCode", _STATUS_MAP)
 
         self.engine_speed_reg = Reg_u16(0x1000, "/Engine/Speed", 1, "%.0f RPM")
 
@@ -149,15 +167,17 @@ class Mebay_Generator(device.CustomName, device.ErrorId, device.Genset):
         eids = []
 
         # alarms -- shutdown
-        if reg.value[0] in alarm_codes:
+        if reg.value[0] in _ALARM_CODES:
             eids.append( ("e", reg.value[0]) )
     
         # warnings -- there are 4 registers with 16-bits each
-        for i, bits in enumerate(reg.value[1:][::-1]):
-            offset = 0x10 * i
-            for v in enumerate(unpack_bits(bits)):
-                if v[1]:
-                    eids.append( ("w", offset + v[0]) )
+        for idx, offset in self._WARN_SLOTS:
+            b = reg.value[idx] & 0xFFFF
+            while b:
+                lsb = b & -b
+                i = 15 - (lsb.bit_length() - 1)  # MSB-first numbering
+                eids.append( ("w", offset + i) )
+                b ^= lsb
 
         self.set_error_ids(eids)
 
@@ -165,23 +185,7 @@ class Mebay_Generator(device.CustomName, device.ErrorId, device.Genset):
         self.data_regs = [
             self.running_status_reg,
             self.engine_speed_reg,
-            Reg_u16(0x101B, "/Ac/Power", 1, "%.0f W"),
-            Reg_u16(0x1018, "/Ac/L1/Power", 1, "%.0f W"),
-            Reg_u16(0x1019, "/Ac/L2/Power", 1, "%.0f W"),
-            Reg_u16(0x101A, "/Ac/L3/Power", 1, "%.0f W"),
-            Reg_u16(0x100A, "/Ac/L1/Voltage", 1, "%.0f V"),
-            Reg_u16(0x100B, "/Ac/L2/Voltage", 1, "%.0f V"),
-            Reg_u16(0x100C, "/Ac/L3/Voltage", 1, "%.0f V"),
-            Reg_u16(0x1010, "/Ac/L1/Current", 1, "%.0f A"),
-            Reg_u16(0x1011, "/Ac/L2/Current", 1, "%.0f A"),
-            Reg_u16(0x1012, "/Ac/L3/Current", 1, "%.0f A"),
-            Reg_u16(0x1009, "/Ac/Frequency", 10, "%.1f Hz"),
-            Reg_u16(0x1054, "/Engine/CoolantTemperature", 1, "%.1f C"),
-            Reg_u16(0x1053, "/Engine/OilPressure", 1, "%.0f kPa"),
-            Reg_u16(0x1039, "/Engine/Load", 1, "%.0f %%"),
-            Reg_u16(0x1035, "/Engine/Starts", 1, "%.0f"),
             Reg_u32b(0x1036, "/Engine/OperatingHours", 1 / 3600, "%.1f s"),
-            Reg_u16(0x1001, "/StarterVoltage", 10, "%.1f V"),
             Reg_mapu16(
                 0x103F,
                 "/RemoteStartModeEnabled",
@@ -192,8 +196,11 @@ class Mebay_Generator(device.CustomName, device.ErrorId, device.Genset):
                     0x00CC: 0,  # Test on load mode
                 },
             ),
-            Reg_Mebay_alarms(),
+            Reg_Mebay_alarms(onchange=self.alarm_changed),
         ]
+        self.data_regs += [Reg_u16(*spec) for spec in self._DATA_REG_SPEC]
+
+        self.init_status_code = self.read_register(self.running_status_reg)
 
     def device_init_late(self):
         super().device_init_late()
@@ -203,7 +210,7 @@ class Mebay_Generator(device.CustomName, device.ErrorId, device.Genset):
             self.dbus.add_path("/FirmwareVersion", None)
 
         # check if generator is running
-        is_running = self.read_register(self.running_status_reg) > 0
+        is_running = (self.init_status_code or 0) > 0
 
         # Add /Start path
         self.dbus.add_path(
@@ -221,22 +228,21 @@ class Mebay_Generator(device.CustomName, device.ErrorId, device.Genset):
             onchangecallback=self._set_remote_start_mode,
         )
 
+    def _write_scf_key(self, scf_key):
+        # Control functions are issued by writing the password followed
+        # by the function key in a single transaction at 0x2000
+        self.write_modbus(0x2000, [self.SCF_PASSWORD, scf_key])
+
     def _start_genset(self, _, value):
         if value:
-            self.modbus.write_registers(
-                0x2000, [self.SCF_PASSWORD, self.SCF_TELEMETRY_START], unit=self.unit
-            )
+            self._write_scf_key(self.SCF_TELEMETRY_START)
         else:
-            self.modbus.write_registers(
-                0x2000, [self.SCF_PASSWORD, self.SCF_TELEMETRY_STOP], unit=self.unit
-            )
+            self._write_scf_key(self.SCF_TELEMETRY_STOP)
         return True
 
     def _set_remote_start_mode(self, _, value):
         if value == 1:
-            self.modbus.write_registers(
-                0x2000, [self.SCF_PASSWORD, self.SCF_SELECT_AUTO_MODE], unit=self.unit
-            )
+            self._write_scf_key(self.SCF_SELECT_AUTO_MODE)
         return True
 
 
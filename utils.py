@@ -1,8 +1,19 @@
 # miscellaneous utilities
 
 import dbus
+import fcntl
+import functools
 import ipaddress
 import os
+import socket
+import struct
+
+SIOCGIFFLAGS = 0x8913
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891b
+
+IFF_UP = 0x1
+IFF_LOOPBACK = 0x8
 
 def private_bus():
     '''Return a private D-Bus connection
@@ -39,6 +50,10 @@ class timeout:
     def __exit__(self, exc_type, exc_value, traceback):
         self.obj.timeout = self.orig_timeout
 
+@functools.lru_cache(maxsize=64)
+def _parse_iface(addr, mask):
+    return ipaddress.IPv4Interface((addr, mask))
+
 def get_networks(blacklist):
     '''Get IPv4 networks of host
 
@@ -54,14 +69,31 @@ def get_networks(blacklist):
 
     nets = []
 
+    def ifreq(sock, req, name):
+        return fcntl.ioctl(sock.fileno(), req, struct.pack('256s', name))
+
     try:
-        with os.popen('ip -br -4 addr show scope global up') as ip:
-            for line in ip:
-                v = line.split()
-                if v[0] in blacklist:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for _, name in socket.if_nameindex():
+                if name in blacklist:
+                    continue
+
+                ifname = name[:15].encode()
+
+                try:
+                    flags = struct.unpack_from('H', ifreq(sock, SIOCGIFFLAGS, ifname), 16)[0]
+                    if not flags & IFF_UP or flags & IFF_LOOPBACK:
+                        continue
+
+                    addr = socket.inet_ntoa(ifreq(sock, SIOCGIFADDR, ifname)[20:24])
+                    mask = socket.inet_ntoa(ifreq(sock, SIOCGIFNETMASK, ifname)[20:24])
+                except OSError:
+                    continue        # no IPv4 address
+
+                net = _parse_iface(addr, mask)
+                if net.ip.is_link_local:
                     continue
 
-                net = ipaddress.IPv4Interface(v[2])
                 nets.append(net)
     except:
         pass